@@ -91,10 +91,7 @@ def main() -> int:
             input('% Press enter to run...')
         from .virtual_machine import VM
         vm = VM(binary, ns.args)
-        try:
-            vm.run()
-        except VM.VmTerminated as ex:
-            return ex.exit_code
+        return vm.run()
     elif ns.cmd in ('disassemble', 'asm'):
         from .virtual_machine.bytecode.structures.binary import BytecodeBinary
         with ns.file.open('rb') as file:
@@ -154,10 +154,7 @@ def main(ns: CompilerParsedArgs) -> int:
     if ns.run:
         from ..virtual_machine import VM
         vm = VM(binary, ns.args)
-        try:
-            vm.run()
-        except VM.VmTerminated as ex:
-            return ex.exit_code
+        return vm.run()
 
     return 0
 
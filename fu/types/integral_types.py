@@ -1,4 +1,6 @@
+from bisect import bisect_left
 from dataclasses import dataclass, field
+from math import inf
 from typing import ClassVar, Self
 
 from . import TypeBase
@@ -28,28 +30,45 @@ class IntType(IntegralType):
     """Describes a type that is an integer number (ℤ)."""
     size: int
     signed: bool
+    _min: int = field(init=False, repr=False, compare=False)
+    _max: int = field(init=False, repr=False, compare=False)
 
-    def range(self) -> tuple[int, int]:
+    def __post_init__(self) -> None:
+        TypeBase.__post_init__(self)
         max = (2**(self.size * 8)) - 1
         min = 0
         if self.signed:
             max = max // 2
             min = -(max + 1)
-        return min, max
+        object.__setattr__(self, '_min', min)
+        object.__setattr__(self, '_max', max)
+
+    def range(self) -> tuple[int, int]:
+        return self._min, self._max
+
+    def could_hold_int(self, value: int | float) -> bool:
+        """Like `could_hold_value`, for callers that already know `value` is a number. Floats are compared against the
+        range as they are, before any truncation."""
+        return self._min <= value <= self._max
 
     def could_hold_value(self, value: str | int) -> bool:
         try:
             if isinstance(value, str):
                 value = int(value)
-            min, max = self.range()
-            return min <= value <= max
+            return self._min <= value <= self._max
         except:
             return False
 
     @classmethod
     def best_for_value(cls, value: int, want_signed: bool = False):
-        options = _SIGNED_TYPES if want_signed or value < 0 else _UNSIGNED_TYPES
-        return min((x for x in options if x.could_hold_value(value)), key=lambda x: x.size)
+        if want_signed or value < 0:
+            bits, (keys, options) = (~value if value < 0 else value).bit_length(), _SIGNED_THRESHOLDS
+        else:
+            bits, (keys, options) = value.bit_length(), _UNSIGNED_THRESHOLDS
+        index = bisect_left(keys, bits)
+        if index == len(options):
+            raise ValueError(f"No integer type wide enough to represent {value}.")
+        return options[index]
 
 
 I8_TYPE = IntType('i8', size=1, signed=True)
@@ -67,6 +86,10 @@ USIZE_TYPE = IntType('usize_t', size=8, signed=False)
 _SIGNED_TYPES = (I8_TYPE, I16_TYPE, I32_TYPE, I64_TYPE)
 _UNSIGNED_TYPES = (U8_TYPE, U16_TYPE, U32_TYPE, U64_TYPE)
 
+# (value bits each type can store, types), ordered by size for bisecting in `best_for_value`.
+_SIGNED_THRESHOLDS = tuple(x.size * 8 - 1 for x in _SIGNED_TYPES), _SIGNED_TYPES
+_UNSIGNED_THRESHOLDS = tuple(x.size * 8 for x in _UNSIGNED_TYPES), _UNSIGNED_TYPES
+
 #
 # ================  FLOAT TYPES  ================
 #
@@ -89,13 +112,17 @@ class FloatType(IntegralType):
 
     @classmethod
     def best_for_value(cls, value: float, want_signed: bool = False):
-        return min((x for x in (F16_TYPE, F32_TYPE, F64_TYPE) if x.could_hold_value(value)), key=lambda x: x.size)
+        keys, options = _FLOAT_THRESHOLDS
+        return options[bisect_left(keys, abs(value))]
 
 
 F16_TYPE = FloatType('f16', size=2, exp_bits=5)
 F32_TYPE = FloatType('f32', size=4, exp_bits=8)
 F64_TYPE = FloatType('f64', size=8, exp_bits=11)
 
+# (largest finite magnitude each type can store, types), ordered by size for bisecting in `best_for_value`.
+_FLOAT_THRESHOLDS = (65504.0, 3.4028234663852886e+38, inf), (F16_TYPE, F32_TYPE, F64_TYPE)
+
 #
 # ================  ENUM TYPES  ================
 #
@@ -110,22 +137,19 @@ class EnumType(IntType):
     is_builtin: bool = field(default=False)
 
     def __post_init__(self) -> None:
-        TypeBase.__post_init__(self)
         if self.inherits == ():
             min_val = min(self.values.values())
             max_val = max(self.values.values())
-            options = _UNSIGNED_TYPES if min_val < 0 else _SIGNED_TYPES
-            selection: IntType | None = None
-            for option in options:
-                t_min, t_max = option.range()
-                if (t_min <= min_val <= t_max) and (t_max >= max_val >= min_val):
-                    selection = option
-                    break
-            if selection is None:
+            # `~min_val` needs the same number of value bits as `min_val`, so the widest bound picks the type.
+            try:
+                selection = IntType.best_for_value(max(max_val, ~min_val) if min_val < 0 else max_val,
+                                                   want_signed=min_val < 0)
+            except ValueError:
                 raise ValueError("No integer type exists that can satisfy an enumeration with inclusive range "
-                                 f"{min_val}-{max_val}.")
+                                 f"{min_val}-{max_val}.") from None
             object.__setattr__(self, 'inherits', (selection, ))
         object.__setattr__(self, 'size', self.inherits[0].size)
+        IntType.__post_init__(self)
 
         for name in self.values:
             self.members[name] = self
@@ -1,14 +1,13 @@
-import weakref
-from enum import Enum
-from dataclasses import dataclass, field, InitVar
-from typing import Any, TypeVar, ClassVar, Callable
-from inspect import isclass
+import struct
+from dataclasses import dataclass, field
+from logging import DEBUG
+from typing import Any, TypeVar, Callable, TypeAlias
 from time import perf_counter
-from operator import add, sub, mul, floordiv, truediv
-from collections import UserString
+from operator import add, sub, mul
+from functools import partial
 
 from ..types.integral_types import FloatType, IntType
-from .bytecode import NumericTypes, OpcodeEnum, ParamType, getLogger, int_u16
+from .bytecode import NumericTypes, OpcodeEnum, ParamType, enum_from_byte, getLogger, int_u16
 from .bytecode.structures import BytecodeBinary
 
 _LOG = getLogger(__name__)
@@ -16,6 +15,7 @@ _LOG = getLogger(__name__)
 T = TypeVar('T', bound=int)
 
 MAX_RECURSION = 100
+_MAX_REPR_ELEMENTS = 32
 
 
 @dataclass(slots=True)
@@ -26,281 +26,586 @@ class StackFrame:
     stack: list[Any] = field(init=False, default_factory=list)
 
 
-class String(UserString):
-    ...
+Ref: TypeAlias = int
+"""A reference to a heap object: its index in the heap."""
 
 
-@dataclass(repr=False)
-class Ref:
-    refs: ClassVar[dict[int, int]] = {}
-    id_: int
-    value: InitVar[Any]
-    on_destruct: Callable[[int], None]
-    _value: weakref.ref[Any] = field(init=False)
+@dataclass(slots=True, repr=False)
+class Array:
+    # Slot 0 is the length, followed by one slot per element.
+    _underlying: list[Any]
 
-    def get_value(self) -> Any:
-        return self._value()
+    @classmethod
+    def of(cls, elements: list[Any]) -> 'Array':
+        return cls([len(elements), *elements])
 
-    def __post_init__(self, value: Any) -> None:
-        self._value = weakref.ref(value)
-        if self.id_ not in self.refs:
-            self.refs[self.id_] = 1
-            return
-        self.refs[self.id_] += 1
+    @property
+    def length(self) -> int:
+        return self._underlying[0]
+
+    def __getitem__(self, index: int) -> Any:
+        return self._underlying[index]
 
     def __repr__(self) -> str:
-        return f"@{self.id_:08x}"
+        elements = ','.join(map(repr, self._underlying[1:_MAX_REPR_ELEMENTS + 1]))
+        if self.length > _MAX_REPR_ELEMENTS:
+            elements += ',...'
+        return f"Array[{self.length}]<{elements}>"
 
-    def __del__(self) -> None:
-        count = self.refs[self.id_]
-        self.refs[self.id_] -= 1
-        if count == 1:
-            del self.refs[self.id_]
-            self.on_destruct(self.id_)
 
+class Heap:
+    """Objects referenced by `Ref`s. Objects live for as long as the VM does."""
+    _objects: list[Any]
 
-@dataclass(repr=False)
-class Array:
-    length: int
-    _underlying: list[Any]
+    def __init__(self) -> None:
+        self._objects = []
 
-    def __getitem__(self, index: int) -> Any:
-        if index == 0:
-            return self.length
-        return self._underlying[index - 1]
+    def add(self, value: Any) -> Ref:
+        self._objects.append(value)
+        return len(self._objects) - 1
+
+    def __getitem__(self, ref: Ref) -> Any:
+        return self._objects[ref]
 
     def __repr__(self) -> str:
-        return f"Array[{self.length}]<{','.join(repr(x) for x in self._underlying)}>"
+        return '{' + ', '.join(f"@{i:08x}: {v!r}" for i, v in enumerate(self._objects)) + '}'
 
 
-class Heap:
-    _objects: dict[int, Any]
+ParamLayout: TypeAlias = tuple[int, Callable[..., Any], bool]
 
-    def __init__(self) -> None:
-        self._objects = {}
 
-    def _on_destruct(self, id_: int) -> None:
-        _LOG.debug("Destructing heap object @%08x", id_)
-        del self._objects[id_]
+def _param_layout(param: ParamType | NumericTypes) -> ParamLayout:
+    """Size, decoder, and whether the decoder takes a single byte (enums) rather than the code and an offset."""
+    if param.is_enum:
+        return len(param), enum_from_byte(param.type_), True
+    return len(param), param.type_, False
 
-    def add(self, value: Any) -> Ref:
-        id_ = id(value)
-        self._objects[id_] = value
-        return Ref(id_, value, self._on_destruct)
 
-    def __repr__(self) -> str:
-        return '{' + ', '.join(f"@{i:08x}: {v!r}" for i, v in self._objects.items() if v is not None) + '}'
+_PARAM_LAYOUTS: dict[ParamType | NumericTypes, ParamLayout] = {
+    p: _param_layout(p)
+    for p in (*ParamType, *NumericTypes)
+}
+
+Decoder: TypeAlias = Callable[[memoryview, int], tuple[int, tuple[Any, ...]]]
+
+
+def _make_decoder(op: OpcodeEnum) -> Decoder:
+    """Build a function that decodes an `op` instruction at an instruction pointer, returning its length and
+    parameters."""
+    # The layout of each parameter, or None where the parameter before it determines it.
+    layout = tuple(None if p is Ellipsis else _PARAM_LAYOUTS[p] for p in op.params)
+    if not layout:
+        return lambda code, ip: (1, ())
+    if len(layout) == 1:
+        size, type_, from_byte = layout[0]
+        if from_byte:
+            return lambda code, ip: (1 + size, (type_(code[ip + 1]), ))
+        return lambda code, ip: (1 + size, (type_(code, ip + 1), ))
+
+    def decode(code: memoryview, ip: int) -> tuple[int, tuple[Any, ...]]:
+        at = ip + 1
+        params: list[Any] = []
+        for param in layout:
+            if param is None:
+                param = _PARAM_LAYOUTS[params[-1]]
+            size, type_, from_byte = param
+            params.append(type_(code[at]) if from_byte else type_(code, at))
+            at += size
+        return at - ip, tuple(params)
+
+    return decode
+
+
+def _decode_invalid(code: memoryview, ip: int) -> tuple[int, tuple[Any, ...]]:
+    # Undefined opcodes take no parameters; executing one fails in `VM._op_not_supported`.
+    return 1, ()
+
+
+# Opcode byte -> decoder for that opcode.
+_DECODERS: list[Decoder] = [_decode_invalid] * 256
+for _op in OpcodeEnum:
+    _DECODERS[_op.value] = _make_decoder(_op)
+del _op
+
+
+def _opcode_name(opcode: int) -> str:
+    """The mnemonic of `opcode`, or its byte value if it isn't a defined opcode."""
+    try:
+        return OpcodeEnum(opcode).name
+    except ValueError:
+        return f"{opcode:#04x}"
+
+
+def _get_string_slot(thing: str, slot: int) -> Any:
+    # Slot 0 is the length, followed by one slot per character.
+    if slot == 0:
+        return len(thing)
+    return thing[slot - 1]
+
+
+def _get_missing_slot(thing: Any, slot: int) -> Any:
+    raise NotImplementedError(f"Don't know how to access slot {slot} of a {type(thing).__name__}")
+
+
+_SLOT_GETTERS: dict[type, Callable[[Any, int], Any]] = {
+    str: _get_string_slot,
+    tuple: tuple.__getitem__,
+    Array: Array.__getitem__,
+}
+
+
+def _get_slot_of(thing: Any, slot: int) -> Any:
+    return _SLOT_GETTERS.get(type(thing), _get_missing_slot)(thing, slot)
+
+# Opcode bytes, for matching instructions while decoding.
+_PUSH_LITERAL = OpcodeEnum.PUSH_LITERAL.value
+_PUSH_ARG = OpcodeEnum.PUSH_ARG.value
+_PUSH_LOCAL = OpcodeEnum.PUSH_LOCAL.value
+_LESS = OpcodeEnum.LESS.value
+_JMP = OpcodeEnum.JMP.value
+_JZ = OpcodeEnum.JZ.value
+_INIT_ARGS = OpcodeEnum.INIT_ARGS.value
+_CALL_EXPORT = OpcodeEnum.CALL_EXPORT.value
+_TAIL_EXPORT = OpcodeEnum.TAIL_EXPORT.value
+
+
+# The range of each integer numeric type.
+_INT_BOUNDS: dict[NumericTypes, tuple[int, int]] = {
+    t: n_type.range()
+    for t in NumericTypes if isinstance(n_type := t.to_type(), IntType)
+}
+
+
+def _checked(type_: NumericTypes, value: Any) -> Any:
+    """Return the result of a checked operation, if it fits in `type_`."""
+    bounds = _INT_BOUNDS.get(type_)
+    if bounds is None:
+        # Floats aren't range checked.
+        return value
+    min_, max_ = bounds
+    if min_ > value or value > max_:
+        # TODO: checked exception
+        raise RuntimeError("Integer over/underflow!")
+    return value
+
+
+def _checked_floordiv(lhs: Any, rhs: Any) -> Any:
+    if not rhs:
+        # A RuntimeError for now, like `_checked`'s overflow (see the TODO there).
+        raise RuntimeError("Division by zero!")
+    return lhs // rhs
+
+
+def _checked_truediv(lhs: Any, rhs: Any) -> Any:
+    if not rhs:
+        raise RuntimeError("Division by zero!")
+    return lhs / rhs
+
+
+# Opcode byte -> operator, for checked arithmetic opcodes.
+_CHECKED_OPERATORS: dict[int, Callable[[Any, Any], Any]] = {
+    OpcodeEnum.CHECKED_ADD.value: add,
+    OpcodeEnum.CHECKED_SUB.value: sub,
+    OpcodeEnum.CHECKED_MUL.value: mul,
+    OpcodeEnum.CHECKED_IDIV.value: _checked_floordiv,
+    OpcodeEnum.CHECKED_FDIV.value: _checked_truediv,
+}
+
+Handler: TypeAlias = Callable[[StackFrame, tuple[Any, ...], int], int]
+Instruction: TypeAlias = tuple[Handler, tuple[Any, ...], int, bool]
+"""A decoded instruction: its handler, parameters, the address following it, and whether it changes frames."""
 
 
 class VM:
     """Fu virtual machine."""
 
-    class VmTerminated(Exception):
-        exit_code: int
-
-        def __init__(self, exit_code: int) -> None:
-            self.exit_code = exit_code
+    __slots__ = ('code', 'binary', 'ip', 'exit_code', '_heap', '_handlers', '_instructions', '_stack_frames',
+                 '_frame_pool', '_build_args')
 
-    code: bytes
+    code: memoryview
     binary: BytecodeBinary
+    ip: int
+    exit_code: int | None
     _heap: Heap
-    ip = 0
-
-    _stack_frames: list[StackFrame] = []
-    _build_args: None | tuple[Any, ...] = None
+    _handlers: list[tuple[Handler, bool]]
+    _instructions: list[Instruction]
+    _stack_frames: list[StackFrame]
+    _frame_pool: list[StackFrame]
+    """Frames that have returned, to be reused by later calls."""
+    _build_args: None | tuple[Any, ...]
 
     def __init__(self, binary: BytecodeBinary, args: list[str]):
         self.binary = binary
-        self.code = binary.bytecode
+        self.code = memoryview(binary.bytecode)
         self._heap = Heap()
+        self._build_args = None
+        self.exit_code = None
 
         assert binary.entrypoint is not None
         self.ip = binary.entrypoint
 
-        self._stack_frames.append(
-            StackFrame((self._heap.add(Array(len(args), [self._heap.add(String(arg)) for arg in args])), ), -1))
+        self._stack_frames = [
+            StackFrame((self._heap.add(Array.of([self._heap.add(arg) for arg in args])), ), -1)
+        ]
+        self._frame_pool = []
 
-        print(f"% VM initialized with main(args: str[] = {self._stack_frames[0].args[0]}), "
-              f"heap: {self._heap!r}\n% Bytecode ({len(self.code):,} Bytes)")
+        self._handlers = self._make_handlers()
+        # Instructions are decoded the first time they're executed.
+        self._instructions = [(self._op_decode, (ip, ), ip, False) for ip in range(len(self.code))]
 
-    def run(self):
+        print(f"% VM initialized with main(args: str[] = @{self._stack_frames[0].args[0]:08x})\n"
+              f"% Bytecode ({len(self.code):,} Bytes)")
+        _LOG.debug("Initial heap: %r", self._heap)
+
+    def run(self) -> int:
+        """Run the program until `main` returns, and return its exit code."""
         # input('% Press enter to run...')
         start = perf_counter()
         extra = ''
+        instructions = self._instructions
+        frames = self._stack_frames
+        # The instruction pointer and current frame are kept in locals; `self.ip` is only updated once we stop, and
+        # `frame` is only rebound by opcodes that change it.
+        ip = self.ip
+        frame = frames[-1]
         try:
-            while True:
-                if 0 > self.ip or self.ip >= len(self.code):
-                    raise RuntimeError(f'Instruction pointer out of bounds ({self.ip:#06x})!')
-                self.step()
-        except VM.VmTerminated as ex:
-            extra = f' with exit code {ex.exit_code:,}'
-            raise
+            # Returning from the outermost frame empties the frame stack. Jumps out of the code fail when they're taken,
+            # so `ip` can only leave the code by running off the end of it, which fails to index `instructions`.
+            while frames:
+                handler, params, next_ip, changes_frame = instructions[ip]
+                ip = handler(frame, params, next_ip)
+                if changes_frame and frames:
+                    frame = frames[-1]
+        except IndexError:
+            if 0 <= ip < len(instructions):
+                raise
+            raise RuntimeError(f'Instruction pointer out of bounds ({ip:#06x})!') from None
+        else:
+            assert self.exit_code is not None
+            extra = f' with exit code {self.exit_code:,}'
+            return self.exit_code
         finally:
+            self.ip = ip
             end = perf_counter()
             print(f"% vm terminated after {(end - start) * 1000:0.4f}ms{extra}.")
 
-    def decode_op(self) -> tuple[int, OpcodeEnum, list[Any]]:
-        op = OpcodeEnum(self.code[self.ip])
-        # print(f'decoding {op}')
-        length = 1
-        params = []
-        last: ParamType | NumericTypes | None = None
-        for t in op.params:
-            if t is Ellipsis:
-                if isclass(last.type_) and issubclass(last.type_, Enum):
-                    val = last.type_(self.code[self.ip + length])
-                else:
-                    val = last.type_(self.code[self.ip + length:self.ip + length + len(last)])
-                length += len(last)
-            else:
-                if isclass(t.type_) and issubclass(t.type_, Enum):
-                    val = t.type_(self.code[self.ip + length])
-                else:
-                    val = t.type_(self.code[self.ip + length:self.ip + length + len(t)])
-                length += len(t)
-            params.append(val)
-            last = val
-        return length, op, params
-
-    def _get_slot_of(self, thing: Any, slot: int) -> Any:
-        match thing:
-            case str():
-                if slot == 0:
-                    return len(thing)
-                return thing[slot + 1]
-            case tuple() | Array():
-                return thing[slot]
-            case _:
-                raise NotImplementedError(f"Don't know how to access slot {slot} of a {type(thing).__name__}")
-
-    def step(self) -> None:
-        length, op, params = self.decode_op()
-        stack_frame = self._stack_frames[-1]
+    def _trace(self, handler: Handler, ip: int, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
         _LOG.debug("Frame #%d; Stack %r; Locals %r; Args: %r; Init-Args: %r; Heap: %r", len(self._stack_frames),
-                   stack_frame.stack, stack_frame.locals, stack_frame.args, self._build_args, self._heap)
-        _LOG.debug(f"\t{self.ip:#06x} {op.name}({params})")
-
-        if op == OpcodeEnum.PUSH_ARG:
-            # Push argument # onto the stack.
-            stack_frame.stack.append(stack_frame.args[params[0]])
-            self.ip += length
-        elif op == OpcodeEnum.PUSH_REF:
-            # Pop a heap ref off the stack, and push the value from the heap object's slot # onto the stack.
-            ref = stack_frame.stack.pop()
-            assert isinstance(ref, Ref)
-            value = self._get_slot_of(ref.get_value(), params[0])
-            del ref
-            stack_frame.stack.append(value)
-            self.ip += length
-        elif op == OpcodeEnum.PUSH_LOCAL:
-            # Copy the value of a local onto the stack.
-            stack_frame.stack.append(stack_frame.locals[params[0]])
-            self.ip += length
-        elif op == OpcodeEnum.CHECKED_CONVERT:
-            # Pop a value off the heap and convert it to the target datatype, pushing the result on the heap.
-            to = params[0]
-            assert isinstance(to, NumericTypes)
-            to_type = to.to_type()
-            match to_type:
-                case IntType():
-                    min_, max_ = to_type.range()
-                    val = stack_frame.stack.pop()
-                    if not isinstance(val, (int, float)) or min_ > val or val > max_:
-                        # todo: exceptions
-                        raise RuntimeError(f"Checked numeric conversion from '{val!r}' to `{to.name}` failed")
-                    val = int(val)
-                case _:
-                    raise NotImplementedError()
-            stack_frame.stack.append(val)
-            self.ip += length
-        elif op == OpcodeEnum.INIT_LOCAL:
-            # Pop a value off the stack and append it to the locals.
-            stack_frame.locals.append(stack_frame.stack.pop())
-            self.ip += length
-        elif op == OpcodeEnum.RET:
-            # Copy the last stack value from this frame and push it onto the last frame, then delete this frame.
-            return_value = stack_frame.stack.pop() if stack_frame.stack else None
-            return_address = self._stack_frames.pop().return_address
-            if not self._stack_frames:
-                assert return_value is None or isinstance(return_value, int), f"{return_value!r}"
-                raise VM.VmTerminated(return_value or 0)
-            self._stack_frames[-1].stack.append(return_value)
-            self.ip = return_address
-        elif op == OpcodeEnum.PUSH_LITERAL:
-            # Push a literal onto the stack
-            stack_frame.stack.append(params[1])
-            self.ip += length
-            # print(f'incrementing ip by {length}')
-        elif op == OpcodeEnum.PUSH_ARRAY:
-            # Pop an index
-            index = stack_frame.stack.pop()
-            # pop a ref
-            ref = stack_frame.stack.pop()
-            assert isinstance(ref, Ref)
-            value = self._get_slot_of(ref.get_value(), index + 1)
-            del ref
-            stack_frame.stack.append(value)
-            self.ip += length
-        elif op in (OpcodeEnum.CHECKED_ADD, OpcodeEnum.CHECKED_SUB, OpcodeEnum.CHECKED_MUL, OpcodeEnum.CHECKED_IDIV,
-                    OpcodeEnum.CHECKED_FDIV):
-            rhs = stack_frame.stack.pop()
-            lhs = stack_frame.stack.pop()
-            type_ = params[0]
-            assert isinstance(type_, NumericTypes)
-            n_type = NumericTypes.to_type(type_)
-
-            val = {
-                OpcodeEnum.CHECKED_ADD: add,
-                OpcodeEnum.CHECKED_SUB: sub,
-                OpcodeEnum.CHECKED_MUL: mul,
-                OpcodeEnum.CHECKED_IDIV: floordiv,
-                OpcodeEnum.CHECKED_FDIV: truediv,
-            }[op](lhs, rhs)
-            if isinstance(n_type, IntType):
-                min_, max_ = n_type.range()
-                if min_ > val or val > max_:
-                    raise RuntimeError("Integer over/underflow!")
-                    # TODO: checked exception
-                    pass
-            stack_frame.stack.append(val)
-            self.ip += length
-        elif op == OpcodeEnum.JMP:
-            self.ip = params[0]
-        elif op == OpcodeEnum.CALL_EXPORT:
-            # Create new stack frame
-            if len(self._stack_frames) == MAX_RECURSION:
-                raise RuntimeError("Maximum recursion depth reached.")
-            self._stack_frames.append(StackFrame(self._build_args or (), self.ip + length))
-            self._build_args = None
-            # Jump to function
-            self.ip = self.binary.functions[params[0]].address
-        elif op == OpcodeEnum.TAIL_EXPORT:
-            # reuse stack frame
-            stack_frame.args = self._build_args or ()
-            # stack_frame.return_address = self.ip + length
-            stack_frame.stack.clear()
-            self._build_args = None
-            # Jump to function
-            self.ip = self.binary.functions[params[0]].address
-        elif op == OpcodeEnum.JZ:
-            # Jump only if top of stack is zero
-            top_stack = stack_frame.stack[-1]
-            if top_stack in (0, False):
-                self.ip += params[0]
-            self.ip += length
-        elif op == OpcodeEnum.INIT_ARGS:
-            arg_pack = []
-            for _ in range(params[0]):
-                arg_pack.append(stack_frame.stack.pop())
-            self._build_args = tuple(reversed(arg_pack))
-            self.ip += length
-        elif op == OpcodeEnum.CMP:
-            stack_frame.stack.append(stack_frame.stack.pop() == stack_frame.stack.pop())
-            self.ip += length
-        elif op == OpcodeEnum.LESS:
-            right = stack_frame.stack.pop()
-            left = stack_frame.stack.pop()
-            stack_frame.stack.append(left < right)
-            self.ip += length
+                   frame.stack, frame.locals, frame.args, self._build_args, self._heap)
+        _LOG.debug("\t%#06x %s(%r)", ip, _opcode_name(self.code[ip]), list(params))
+        return handler(frame, params, next_ip)
+
+    def _make_handlers(self) -> list[tuple[Handler, bool]]:
+        """Build the opcode dispatch table, indexed by opcode byte: the handler for each opcode, and whether it changes
+        the current frame."""
+        handlers: dict[OpcodeEnum, tuple[Handler, bool]] = {
+            OpcodeEnum.PUSH_ARG: (self._op_push_arg, False),
+            OpcodeEnum.PUSH_REF: (self._op_push_ref, False),
+            OpcodeEnum.PUSH_LOCAL: (self._op_push_local, False),
+            OpcodeEnum.CHECKED_CONVERT: (self._op_checked_convert, False),
+            OpcodeEnum.INIT_LOCAL: (self._op_init_local, False),
+            OpcodeEnum.RET: (self._op_ret, True),
+            OpcodeEnum.PUSH_LITERAL: (self._op_push_literal, False),
+            OpcodeEnum.PUSH_ARRAY: (self._op_push_array, False),
+            OpcodeEnum.CHECKED_ADD: (self._op_checked_add, False),
+            OpcodeEnum.CHECKED_SUB: (self._op_checked_sub, False),
+            OpcodeEnum.CHECKED_MUL: (self._op_checked_mul, False),
+            OpcodeEnum.CHECKED_IDIV: (self._op_checked_idiv, False),
+            OpcodeEnum.CHECKED_FDIV: (self._op_checked_fdiv, False),
+            OpcodeEnum.JMP: (self._op_jmp, False),
+            OpcodeEnum.CALL_EXPORT: (self._op_call_export, True),
+            OpcodeEnum.TAIL_EXPORT: (self._op_tail_export, False),
+            OpcodeEnum.JZ: (self._op_jz, False),
+            OpcodeEnum.INIT_ARGS: (self._op_init_args, False),
+            OpcodeEnum.CMP: (self._op_cmp, False),
+            OpcodeEnum.LESS: (self._op_less, False),
+        }
+        table: list[tuple[Handler, bool]] = [(self._op_not_supported, False)] * 256
+        for op, handler in handlers.items():
+            table[op.value] = handler
+        return table
+
+    def _decode_at(self, ip: int) -> tuple[Instruction, int | None]:
+        """Decode the single instruction at `ip`, returning it and its opcode (None if it couldn't be decoded, or is a
+        jump out of the code).
+
+        The compiler may leave bytes between functions that do not decode cleanly, so failures are only raised if the
+        instruction is executed."""
+        code = self.code
+        opcode = code[ip]
+        try:
+            length, params = _DECODERS[opcode](code, ip)
+        except (ValueError, IndexError, struct.error) as ex:
+            return (self._op_undecodable, (ex, ), ip + 1, False), None
+        handler, changes_frame = self._handlers[opcode]
+        if handler == self._op_not_supported:
+            # Unsupported opcodes only need to know where they are, to report it.
+            params = ip, opcode
+        elif opcode == _JMP or opcode == _JZ:
+            # Resolve the jump offset, relative to the next instruction, to an absolute target.
+            target = ip + length + params[0]
+            if 0 > target or target >= len(code):
+                # Only fails if the jump is taken. Not reported as a JMP or JZ, so it isn't fused.
+                return (self._op_jump_out_of_bounds, (target, opcode == _JZ), ip + length, False), None
+            params = target,
+        return (handler, params, ip + length, changes_frame), opcode
+
+    def _decode_instruction(self, ip: int) -> Instruction:
+        """Decode the instruction at `ip`. If it starts one of a few common sequences, return a superinstruction that
+        runs the whole sequence instead.
+
+        Only the entry at the start of a sequence is fused, so jumps into the middle of one still run the original
+        instructions."""
+        first, opcode = self._decode_at(ip)
+        if opcode == _INIT_ARGS:
+            return self._fuse_call(first)
+        # The other sequences all start by comparing or combining an argument or local with a literal.
+        if opcode != _PUSH_ARG and opcode != _PUSH_LOCAL:
+            return first
+        end = len(self.code)
+        _, (index, ), literal_ip, _ = first
+        if literal_ip >= end:
+            return first
+        (_, literal_params, op_ip, _), literal_opcode = self._decode_at(literal_ip)
+        if literal_opcode != _PUSH_LITERAL or op_ip >= end:
+            return first
+        source = opcode == _PUSH_LOCAL, index, literal_params[1]
+        (_, op_params, next_ip, _), op_opcode = self._decode_at(op_ip)
+        if op_opcode in _CHECKED_OPERATORS:
+            # PUSH_ARG/PUSH_LOCAL, PUSH_LITERAL, CHECKED_*
+            return (partial(self._op_push_literal_arithmetic, _CHECKED_OPERATORS[op_opcode]), (*source, op_params[0]),
+                    next_ip, False)
+        if op_opcode == _LESS and next_ip < end:
+            (_, jz_params, next_ip, _), jz_opcode = self._decode_at(next_ip)
+            if jz_opcode == _JZ:
+                # PUSH_ARG/PUSH_LOCAL, PUSH_LITERAL, LESS, JZ
+                return self._op_push_literal_less_jz, (*source, jz_params[0]), next_ip, False
+        return first
+
+    def _fuse_call(self, init_args: Instruction) -> Instruction:
+        """Fuse an INIT_ARGS and the CALL_EXPORT or TAIL_EXPORT following it into one superinstruction."""
+        _, (count, ), call_ip, _ = init_args
+        if call_ip >= len(self.code):
+            return init_args
+        (_, call_params, next_ip, _), call_opcode = self._decode_at(call_ip)
+        if call_opcode != _CALL_EXPORT and call_opcode != _TAIL_EXPORT:
+            return init_args
+        params = count, self.binary.functions[call_params[0]].address
+        if call_opcode == _CALL_EXPORT:
+            # INIT_ARGS, CALL_EXPORT
+            return self._op_init_args_call_export, params, next_ip, True
+        # INIT_ARGS, TAIL_EXPORT
+        return self._op_init_args_tail_export, params, next_ip, False
+
+    # Opcode handlers: each executes one instruction in the given frame, and returns the next instruction pointer.
+
+    def _op_not_supported(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        ip, opcode = params
+        raise NotImplementedError(f"Opcode {_opcode_name(opcode)} is not supported! At: {ip:#04x}.")
+
+    def _op_decode(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # First execution at this address: decode the instruction in place, then dispatch to it.
+        ip = params[0]
+        instruction = self._decode_instruction(ip)
+        if _LOG.isEnabledFor(DEBUG):
+            handler, params, next_ip, changes_frame = instruction
+            instruction = partial(self._trace, handler, ip), params, next_ip, changes_frame
+        self._instructions[ip] = instruction
+        return ip
+
+    def _op_undecodable(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        raise params[0]
+
+    def _op_push_arg(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # Push argument # onto the stack.
+        frame.stack.append(frame.args[params[0]])
+        return next_ip
+
+    def _op_push_ref(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # Pop a heap ref off the stack, and push the value from the heap object's slot # onto the stack.
+        stack = frame.stack
+        ref: Ref = stack[-1]
+        stack[-1] = _get_slot_of(self._heap[ref], params[0])
+        return next_ip
+
+    def _op_push_local(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # Copy the value of a local onto the stack.
+        frame.stack.append(frame.locals[params[0]])
+        return next_ip
+
+    def _op_checked_convert(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # Pop a value off the heap and convert it to the target datatype, pushing the result on the heap.
+        to = params[0]
+        assert isinstance(to, NumericTypes)
+        to_type = to.to_type()
+        match to_type:
+            case IntType():
+                val = frame.stack.pop()
+                if not isinstance(val, (int, float)) or not to_type.could_hold_int(val):
+                    # todo: exceptions
+                    raise RuntimeError(f"Checked numeric conversion from '{val!r}' to `{to.name}` failed")
+                val = int(val)
+            case _:
+                raise NotImplementedError()
+        frame.stack.append(val)
+        return next_ip
+
+    def _op_init_local(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # Pop a value off the stack and append it to the locals.
+        frame.locals.append(frame.stack.pop())
+        return next_ip
+
+    def _op_ret(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # Copy the last stack value from this frame and push it onto the last frame, then delete this frame.
+        stack = frame.stack
+        return_value = stack.pop() if stack else None
+        returning = self._stack_frames.pop()
+        self._frame_pool.append(returning)
+        return_address = returning.return_address
+        if not self._stack_frames:
+            assert return_value is None or isinstance(return_value, int), f"{return_value!r}"
+            self.exit_code = return_value if return_value is not None else 0
+            return return_address
+        self._stack_frames[-1].stack.append(return_value)
+        return return_address
+
+    def _op_push_literal(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # Push a literal onto the stack
+        frame.stack.append(params[1])
+        return next_ip
+
+    def _op_push_array(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        stack = frame.stack
+        # Pop an index
+        index = stack.pop()
+        # Replace the ref beneath it with the element
+        ref: Ref = stack[-1]
+        stack[-1] = _get_slot_of(self._heap[ref], index + 1)
+        return next_ip
+
+    def _op_checked_add(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        stack = frame.stack
+        rhs = stack.pop()
+        stack[-1] = _checked(params[0], stack[-1] + rhs)
+        return next_ip
+
+    def _op_checked_sub(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        stack = frame.stack
+        rhs = stack.pop()
+        stack[-1] = _checked(params[0], stack[-1] - rhs)
+        return next_ip
+
+    def _op_checked_mul(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        stack = frame.stack
+        rhs = stack.pop()
+        stack[-1] = _checked(params[0], stack[-1] * rhs)
+        return next_ip
+
+    def _op_checked_idiv(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        stack = frame.stack
+        rhs = stack.pop()
+        stack[-1] = _checked(params[0], _checked_floordiv(stack[-1], rhs))
+        return next_ip
+
+    def _op_checked_fdiv(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        stack = frame.stack
+        rhs = stack.pop()
+        stack[-1] = _checked(params[0], _checked_truediv(stack[-1], rhs))
+        return next_ip
+
+    def _op_push_literal_arithmetic(self, operator: Callable[[Any, Any], Any], frame: StackFrame,
+                                    params: tuple[Any, ...], next_ip: int) -> int:
+        # Superinstruction: apply a checked operator to an argument or local and a literal, and push the result.
+        from_local, index, literal, type_ = params
+        frame.stack.append(_checked(type_, operator((frame.locals if from_local else frame.args)[index], literal)))
+        return next_ip
+
+    def _op_push_literal_less_jz(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # Superinstruction: push whether an argument or local is less than a literal, and jump if it isn't.
+        from_local, index, literal, target = params
+        result = (frame.locals if from_local else frame.args)[index] < literal
+        frame.stack.append(result)
+        return next_ip if result else target
+
+    def _op_jmp(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        return params[0]
+
+    def _op_jump_out_of_bounds(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # A JMP, or a JZ if `conditional`, whose target is outside the code.
+        target, conditional = params
+        if conditional and frame.stack[-1] not in (0, False):
+            return next_ip
+        raise RuntimeError(f'Instruction pointer out of bounds ({target:#06x})!')
+
+    def _enter_frame(self, args: tuple[Any, ...], return_address: int) -> None:
+        """Push a new stack frame for a call, reusing a returned frame if there is one."""
+        if len(self._stack_frames) == MAX_RECURSION:
+            raise RuntimeError("Maximum recursion depth reached.")
+        if self._frame_pool:
+            new_frame = self._frame_pool.pop()
+            new_frame.args = args
+            new_frame.return_address = return_address
+            new_frame.locals.clear()
+            new_frame.stack.clear()
         else:
-            raise NotImplementedError(f"Opcode {op.name} is not supported! At: {self.ip:#04x}.")
+            new_frame = StackFrame(args, return_address)
+        self._stack_frames.append(new_frame)
+
+    def _op_call_export(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # Create new stack frame
+        args = self._build_args or ()
+        self._build_args = None
+        self._enter_frame(args, next_ip)
+        # Jump to function
+        return self.binary.functions[params[0]].address
+
+    def _op_tail_export(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # reuse stack frame
+        frame.args = self._build_args or ()
+        # frame.return_address = next_ip
+        frame.stack.clear()
+        self._build_args = None
+        # Jump to function
+        return self.binary.functions[params[0]].address
+
+    def _op_jz(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # Jump only if top of stack is zero
+        return params[0] if frame.stack[-1] in (0, False) else next_ip
+
+    def _op_init_args(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # Move the top # values off the stack, in the order they were pushed.
+        stack = frame.stack
+        start = len(stack) - params[0]
+        self._build_args = tuple(stack[start:])
+        del stack[start:]
+        return next_ip
+
+    def _op_init_args_call_export(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # Superinstruction: call a function with the top # values off the stack as its arguments.
+        count, address = params
+        stack = frame.stack
+        start = len(stack) - count
+        args = tuple(stack[start:])
+        del stack[start:]
+        self._enter_frame(args, next_ip)
+        return address
+
+    def _op_init_args_tail_export(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        # Superinstruction: tail call a function with the top # values off the stack as its arguments.
+        count, address = params
+        stack = frame.stack
+        frame.args = tuple(stack[len(stack) - count:])
+        stack.clear()
+        return address
+
+    def _op_cmp(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        stack = frame.stack
+        right = stack.pop()
+        stack[-1] = stack[-1] == right
+        return next_ip
+
+    def _op_less(self, frame: StackFrame, params: tuple[Any, ...], next_ip: int) -> int:
+        stack = frame.stack
+        right = stack.pop()
+        stack[-1] = stack[-1] < right
+        return next_ip
@@ -1,9 +1,9 @@
 import struct
 from enum import Enum, auto
-from functools import partial
+from functools import cache
 from io import BytesIO
 from logging import getLogger
-from typing import Any, Callable, Iterator, NewType, Optional, TypeAlias, TypeVar
+from typing import Any, Callable, Iterator, NewType, Optional, Protocol, TypeAlias, TypeVar
 from inspect import isclass
 
 from ...types.integral_types import *
@@ -11,12 +11,27 @@ from ...types.integral_types import *
 MODULE_LOGGER = getLogger(__name__)
 
 
-def _decode_struct(pack: str, vals: bytes):
-    return struct.unpack(pack, vals)[0]
+V_co = TypeVar('V_co', covariant=True)
 
 
-def _encode_struct(pack: str, vals):
-    return struct.pack(pack, vals)
+class _StructDecoder(Protocol[V_co]):
+
+    def __call__(self, vals: bytes, offset: int = 0, /) -> V_co:
+        ...
+
+
+def _struct_decoder(pack: str) -> _StructDecoder[Any]:
+    unpack_from = struct.Struct(pack).unpack_from
+
+    def _decode_struct(vals: bytes, offset: int = 0, /) -> Any:
+        """Decode a value from the start of `vals`, or from `offset` bytes into it without slicing."""
+        return unpack_from(vals, offset)[0]
+
+    return _decode_struct
+
+
+def _struct_encoder(pack: str) -> Callable[[Any], bytes]:
+    return struct.Struct(pack).pack
 
 
 int_u8 = NewType('int_u8', int)
@@ -47,37 +62,37 @@ def _decode_numeric(b: bytes, to: type[T]) -> T:
     return _get_numeric_coders(to)[1](b)
 
 
-_decode_u8: Callable[[bytes], int_u8] = partial(_decode_struct, '>B')
-_decode_u16: Callable[[bytes], int_u16] = partial(_decode_struct, '>H')
-_decode_u32: Callable[[bytes], int_u32] = partial(_decode_struct, '>I')
-_decode_u64: Callable[[bytes], int_u64] = partial(_decode_struct, '>Q')
-_decode_i8: Callable[[bytes], int_i8] = partial(_decode_struct, '>b')
-_decode_i16: Callable[[bytes], int_i16] = partial(_decode_struct, '>h')
-_decode_i32: Callable[[bytes], int_i32] = partial(_decode_struct, '>i')
-_decode_i64: Callable[[bytes], int_i64] = partial(_decode_struct, '>q')
-
-_encode_u8: Callable[[int_u8], bytes] = partial(_encode_struct, '>B')
-_encode_u16: Callable[[int_u16], bytes] = partial(_encode_struct, '>H')
-_encode_u32: Callable[[int_u32], bytes] = partial(_encode_struct, '>I')
-_encode_u64: Callable[[int_u64], bytes] = partial(_encode_struct, '>Q')
-_encode_i8: Callable[[int_i8], bytes] = partial(_encode_struct, '>b')
-_encode_i16: Callable[[int_i16], bytes] = partial(_encode_struct, '>h')
-_encode_i32: Callable[[int_i32], bytes] = partial(_encode_struct, '>i')
-_encode_i64: Callable[[int_i64], bytes] = partial(_encode_struct, '>q')
+_decode_u8: _StructDecoder[int_u8] = _struct_decoder('>B')
+_decode_u16: _StructDecoder[int_u16] = _struct_decoder('>H')
+_decode_u32: _StructDecoder[int_u32] = _struct_decoder('>I')
+_decode_u64: _StructDecoder[int_u64] = _struct_decoder('>Q')
+_decode_i8: _StructDecoder[int_i8] = _struct_decoder('>b')
+_decode_i16: _StructDecoder[int_i16] = _struct_decoder('>h')
+_decode_i32: _StructDecoder[int_i32] = _struct_decoder('>i')
+_decode_i64: _StructDecoder[int_i64] = _struct_decoder('>q')
+
+_encode_u8: Callable[[int_u8], bytes] = _struct_encoder('>B')
+_encode_u16: Callable[[int_u16], bytes] = _struct_encoder('>H')
+_encode_u32: Callable[[int_u32], bytes] = _struct_encoder('>I')
+_encode_u64: Callable[[int_u64], bytes] = _struct_encoder('>Q')
+_encode_i8: Callable[[int_i8], bytes] = _struct_encoder('>b')
+_encode_i16: Callable[[int_i16], bytes] = _struct_encoder('>h')
+_encode_i32: Callable[[int_i32], bytes] = _struct_encoder('>i')
+_encode_i64: Callable[[int_i64], bytes] = _struct_encoder('>q')
 
 float_f16 = NewType('float_f16', float)
 float_f32 = NewType('float_f32', float)
 float_f64 = NewType('float_f64', float)
 
-_decode_f16: Callable[[bytes], float_f16] = partial(_decode_struct, '>e')
-_decode_f32: Callable[[bytes], float_f32] = partial(_decode_struct, '>f')
-_decode_f64: Callable[[bytes], float_f64] = partial(_decode_struct, '>d')
-_encode_f16: Callable[[float_f16], bytes] = partial(_encode_struct, '>e')
-_encode_f32: Callable[[float_f32], bytes] = partial(_encode_struct, '>f')
-_encode_f64: Callable[[float_f64], bytes] = partial(_encode_struct, '>d')
+_decode_f16: _StructDecoder[float_f16] = _struct_decoder('>e')
+_decode_f32: _StructDecoder[float_f32] = _struct_decoder('>f')
+_decode_f64: _StructDecoder[float_f64] = _struct_decoder('>d')
+_encode_f16: Callable[[float_f16], bytes] = _struct_encoder('>e')
+_encode_f32: Callable[[float_f32], bytes] = _struct_encoder('>f')
+_encode_f64: Callable[[float_f64], bytes] = _struct_encoder('>d')
 
-_decode_bool: Callable[[bytes], bool] = partial(_decode_struct, '>?')
-_encode_bool: Callable[[bool], bytes] = partial(_encode_struct, '>?')
+_decode_bool: _StructDecoder[bool] = _struct_decoder('>?')
+_encode_bool: Callable[[bool], bytes] = _struct_encoder('>?')
 
 _NUMERIC_CODERS = {
     int_u8: (_encode_u8, _decode_u8),
@@ -98,6 +113,26 @@ def _get_numeric_coders(t: type[T]) -> tuple[Callable[[T], bytes], Callable[[byt
     return _NUMERIC_CODERS[t]  # type: ignore
 
 
+E = TypeVar('E', bound=Enum)
+
+
+@cache
+def enum_from_byte(enum: type[E]) -> Callable[[int], E]:
+    """Build a lookup of `enum`'s members by their single-byte value. Like `enum(value)`, it raises ValueError for
+    values that aren't a member."""
+    members: list[E | None] = [None] * 256
+    for member in enum:
+        members[member.value] = member
+
+    def from_byte(value: int) -> E:
+        member = members[value]
+        if member is None:
+            raise ValueError(f"{value!r} is not a valid {enum.__qualname__}")
+        return member
+
+    return from_byte
+
+
 class NumericTypes(Enum):
 
     def __new__(cls, *args, **kwds):
@@ -110,6 +145,7 @@ class NumericTypes(Enum):
             t = self.__class__
         self._length_ = length
         self._type = t
+        self._is_enum_ = isclass(t) and issubclass(t, Enum)
 
     def __len__(self) -> int:
         return self._length_
@@ -122,6 +158,11 @@ class NumericTypes(Enum):
     def type_(self) -> type:
         return self._type
 
+    @property
+    def is_enum(self) -> bool:
+        """Whether `type_` is an Enum, decoded from a single byte rather than a slice."""
+        return self._is_enum_
+
     u8 = 0, 1, _decode_u8
     u16 = auto(), 2, _decode_u16
     u32 = auto(), 4, _decode_u32
@@ -169,21 +210,25 @@ class NumericTypes(Enum):
         raise NotImplementedError()
 
     def to_type(self) -> IntegralType:
-        match self:
-            case self.u8:
-                return U8_TYPE
-            case self.i32:
-                return I32_TYPE
-            case self.u32:
-                return U32_TYPE
-            case self.f32:
-                return F32_TYPE
-            case self.u64:
-                return U64_TYPE
-            case self.bool:
-                return BOOL_TYPE
-            case _:
-                raise NotImplementedError(f"{self.name}")
+        return _NUMERIC_TO_TYPE[self]
+
+
+_NUMERIC_TO_TYPE: dict[NumericTypes, IntegralType] = {
+    NumericTypes.u8: U8_TYPE,
+    NumericTypes.u16: U16_TYPE,
+    NumericTypes.u32: U32_TYPE,
+    NumericTypes.u64: U64_TYPE,
+    NumericTypes.i8: I8_TYPE,
+    NumericTypes.i16: I16_TYPE,
+    NumericTypes.i32: I32_TYPE,
+    NumericTypes.i64: I64_TYPE,
+    NumericTypes.usize_t: USIZE_TYPE,
+    NumericTypes.size_t: SIZE_TYPE,
+    NumericTypes.f16: F16_TYPE,
+    NumericTypes.f32: F32_TYPE,
+    NumericTypes.f64: F64_TYPE,
+    NumericTypes.bool: BOOL_TYPE,
+}
 
 
 class ParamType(Enum):
@@ -198,6 +243,7 @@ class ParamType(Enum):
             t = self.__class__
         self._length_ = length
         self._type = t
+        self._is_enum_ = isclass(t) and issubclass(t, Enum)
 
     def __len__(self) -> int:
         return self._length_
@@ -210,6 +256,11 @@ class ParamType(Enum):
     def type_(self) -> type:
         return self._type
 
+    @property
+    def is_enum(self) -> bool:
+        """Whether `type_` is an Enum, decoded from a single byte rather than a slice."""
+        return self._is_enum_
+
     # PushOrPop = auto(), 1, bool
 
     ParamType = auto(), 1, ...
@@ -261,7 +312,7 @@ class OpcodeEnum(Enum):
         raw = stream.read(1)
         if len(raw) == 0:
             return None, (None, ), b''
-        op = OpcodeEnum(raw[0])
+        op = _opcode_from_byte(raw[0])
         params = []
         last: ParamType | NumericTypes | None = None
         # input(f"{op}: {op.params}")
@@ -272,8 +323,8 @@ class OpcodeEnum(Enum):
                 val = last.type_(value)
             else:
                 value = stream.read(len(p))
-                if isclass(p.type_) and issubclass(p.type_, Enum):
-                    val = p.type_(value[0])
+                if p.is_enum:
+                    val = enum_from_byte(p.type_)(value[0])
                 else:
                     val = p.type_(value)
             params.append(val)
@@ -342,6 +393,8 @@ class OpcodeEnum(Enum):
     ), 'fdiv.{0.name}', 'pop two, float divide into `{0.name}` (checked), push', ParamType.NumericType
 
 
+_opcode_from_byte = enum_from_byte(OpcodeEnum)
+
 _FRIENDLY_OPCODE_NAMES: dict[OpcodeEnum, str] = {}
 
 BytecodeTypes: TypeAlias = Enum | int_u8 | bytes | tuple['BytecodeTypes', ...] | bool
@@ -349,7 +402,6 @@ BytecodeTypes: TypeAlias = Enum | int_u8 | bytes | tuple['BytecodeTypes', ...] |
 
 def to_bytes(in_: Iterator[BytecodeTypes]) -> Iterator[int]:
     for x in in_:
-        print(x)
         match x:
             case tuple():
                 yield from to_bytes(y for y in x)
@@ -1,20 +1,28 @@
-from io import SEEK_END, BytesIO
 from typing import TYPE_CHECKING, Mapping
 from types import EllipsisType
 
 from ...compiler import SourceLocation
 from ...types import VOID_TYPE, TypeBase
-from . import _encode_numeric, _encode_u32, _to_bytecode_numeric, int_u16, int_u32
+from . import _encode_u32, _to_bytecode_numeric, int_u16, int_u32
 from .structures import BytecodeBinary, BytecodeFunction, BytecodeType
 
+# The empty string is always at the start of the strings table, encoded as just its (zero) length.
+_EMPTY_STRING_ID = int_u32(0)
+_EMPTY_STRING_ENCODED = _encode_u32(int_u32(0))
+
 
 class BytecodeBuilder:
     __code_length: int
 
     __types: list[BytecodeType]
+    __type_ids: dict[BytecodeType, int_u16]
+    __type_type_ids: dict[int, tuple[TypeBase, int_u16]]
+    """Ids of types already added by `add_type_type`, keyed by `id()` of the `TypeBase` (which isn't hashable)."""
     __strings: dict[str, int_u32]
-    __strings_buffer: BytesIO
+    __strings_chunks: list[bytes]
+    __strings_length: int
     __functions: list[BytecodeFunction | EllipsisType]
+    __unfulfilled_reservations: int
     __code: list[bytes]
     __source_map: dict[SourceLocation, tuple[int_u32, int_u32]]
     __function_map: dict[int_u32, int_u16]
@@ -28,21 +36,22 @@ class BytecodeBuilder:
         self.__code_length = 0
 
         self.__types = []
-        zero_pos = int_u32(0)
-        self.__strings = {'': zero_pos}
-        self.__strings_buffer = BytesIO(_encode_u32(zero_pos))
-        self.__strings_buffer.seek(0, SEEK_END)
+        self.__type_ids = {}
+        self.__type_type_ids = {}
+        self.__strings = {'': _EMPTY_STRING_ID}
+        self.__strings_chunks = [_EMPTY_STRING_ENCODED]
+        self.__strings_length = len(_EMPTY_STRING_ENCODED)
         self.__functions = []
+        self.__unfulfilled_reservations = 0
         self.__function_map = {}
         self.__code = []
         self.__source_map = {}
 
     def finalize(self, entrypoint: int_u32 | None) -> BytecodeBinary:
-        assert all(isinstance(x, BytecodeFunction) for x in self.__functions)
-        assert not any(x is Ellipsis for x in self.__functions)
+        assert self.__unfulfilled_reservations == 0, "Finalized with unfulfilled function reservations"
         return BytecodeBinary(
             b''.join(self.__code),
-            self.__strings_buffer.getvalue(),
+            b''.join(self.__strings_chunks),
             self.__types,
             self.__functions,  # type: ignore
             entrypoint,
@@ -50,26 +59,35 @@ class BytecodeBuilder:
 
     def _add_type(self, type_: BytecodeType) -> int_u16:
         # TODO: recursively check...
-        try:
-            return _to_bytecode_numeric(self.__types.index(type_), int_u16)
-        except ValueError:
+        id_ = self.__type_ids.get(type_)
+        if id_ is None:
             self.__types.append(type_)
-            return _to_bytecode_numeric(len(self.__types) - 1, int_u16)
+            id_ = self.__type_ids[type_] = _to_bytecode_numeric(len(self.__types) - 1, int_u16)
+        return id_
 
     def add_type_type(self, type_: TypeBase) -> int_u16:
+        cached = self.__type_type_ids.get(id(type_))
+        if cached is not None:
+            return cached[1]
         if type_ == VOID_TYPE:
-            return self._add_type(BytecodeType(type_=BytecodeType.Type.VOID))
-        return self._add_type(BytecodeType.from_type(self, type_))
+            id_ = self._add_type(BytecodeType(type_=BytecodeType.Type.VOID))
+        else:
+            id_ = self._add_type(BytecodeType.from_type(self, type_))
+        # Keep a reference to the type, so its `id()` can't be reused while it's cached.
+        self.__type_type_ids[id(type_)] = type_, id_
+        return id_
 
     def add_string(self, string: str) -> int_u32:
-        if string not in self.__strings:
-            i = _to_bytecode_numeric(self.__strings_buffer.tell(), int_u32)
-            self.__strings[string] = i
-            encoded = string.encode('utf-8')
-            self.__strings_buffer.write(_encode_numeric(len(encoded), int_u32))
-            self.__strings_buffer.write(encoded)
+        i = self.__strings.get(string)
+        if i is not None:
             return i
-        return self.__strings[string]
+        i = _to_bytecode_numeric(self.__strings_length, int_u32)
+        self.__strings[string] = i
+        encoded = string.encode('utf-8')
+        length = _encode_u32(int_u32(len(encoded)))
+        self.__strings_chunks += length, encoded
+        self.__strings_length += len(length) + len(encoded)
+        return i
 
     def add_function(self, fn: BytecodeFunction, fqdn: int_u32) -> int_u16:
         if fqdn in self.__function_map:
@@ -83,12 +101,15 @@ class BytecodeBuilder:
         if fqdn in self.__function_map:
             raise ValueError()
         self.__functions.append(...)
+        self.__unfulfilled_reservations += 1
         id_ = _to_bytecode_numeric(len(self.__functions) - 1, int_u16)
         self.__function_map[fqdn] = id_
         return id_
 
     def fulfill_function_reservation(self, reservation: int_u16, fn: BytecodeFunction) -> None:
+        assert self.__functions[reservation] is Ellipsis, "Function reservation already fulfilled"
         self.__functions[reservation] = fn
+        self.__unfulfilled_reservations -= 1
 
     def add_code(self, code: bytes) -> int_u32:
         pos = self.__code_length
@@ -1,9 +1,10 @@
 from io import SEEK_SET, BytesIO
-from typing import Iterator
+from functools import cache
+from typing import Callable, Iterator
 
 from ...color import RESET, COMMENT, NUM, FUNC_NAME, FAINT, KEYWORD, PARAM, TEMPLATE, CONSTANT, TYPE
 
-from . import OpcodeEnum, _decode_u32, ParamType, int_u16
+from . import OpcodeEnum, _decode_u32, ParamType
 from .structures import BytecodeBinary, BytecodeFunction, BytecodeType
 
 
@@ -13,25 +14,48 @@ def _get_string(index: int, stream: BytesIO) -> str:
     return '' if length == 0 else stream.read(length).decode('utf-8')
 
 
-def _get_fqdn(func: BytecodeFunction, strings: bytes) -> tuple[str, str]:
-    with BytesIO(strings) as stream:
-        scope = _get_string(func.scope, stream)
-        name = _get_string(func.name, stream)
-    return scope, name
+def _string_table(strings: bytes) -> Callable[[int], str]:
+    """Look up strings in a binary's string table by index, decoding each one only once."""
+    stream = BytesIO(strings)
 
+    @cache
+    def get(index: int) -> str:
+        return _get_string(index, stream)
 
-def _get_signature(func: BytecodeFunction, strings: bytes, types: list[BytecodeType]) -> str:
+    return get
+
+
+def _get_fqdn(func: BytecodeFunction, strings: Callable[[int], str]) -> tuple[str, str]:
+    return strings(func.scope), strings(func.name)
+
+
+def _get_signature(func: BytecodeFunction, strings: Callable[[int], str], types: list[BytecodeType]) -> str:
     t = types[func.signature]
     assert t.name is not None
-    with BytesIO(strings) as stream:
-        return _get_string(t.name, stream)
+    return strings(t.name)
+
+
+@cache
+def _color_op(op: str) -> tuple[str, int]:
+    """Color an instruction's mnemonic, and count the type parameters suffixed to it (e.g. `push.u8`)."""
+    first, *rest = op.split('.')
+    if not rest:
+        return KEYWORD + op + RESET, 0
+    return f"{KEYWORD}{first}{RESET}.{PARAM}" + f'{RESET}.{PARAM}'.join(rest) + RESET, len(rest)
 
 
-def _get_function_id(fn_id: int_u16, binary: BytecodeBinary) -> str:
-    scope, name = _get_fqdn(binary.functions[fn_id], binary.strings)
-    if not scope:
-        return name
-    return scope + '.' + name
+def _color_hex(raw: bytes, color: str) -> str:
+    """Format each byte of `raw` as hex, preceded by a space and `color`."""
+    if not raw:
+        return ''
+    return ' ' + color + raw.hex(' ').replace(' ', ' ' + color)
+
+
+# Output rows, with their colors baked in: a function's label and signature, and an instruction's address, hex bytes
+# (and padding), assembly, and explanation.
+_FUNCTION_ROW = (f"       {FAINT}│                               │ {RESET}{FUNC_NAME}%-17s   "
+                 f"{COMMENT}; %s = {{ /* ... */ }}{RESET}")
+_INSTRUCTION_ROW = f"{FAINT}%#06x │ {RESET}{NUM}%s%s {RESET}{FAINT}│{RESET}   %s {COMMENT}; %s{RESET}"
 
 
 def decompile(bytecode: bytes, binary: BytecodeBinary | None = None, single_function: bool = False) -> Iterator[str]:
@@ -39,11 +63,15 @@ def decompile(bytecode: bytes, binary: BytecodeBinary | None = None, single_func
         raise ValueError("Cannot print single function if binary is not provided")
 
     functions: dict[int, tuple[str, str]] = {}
+    # Function id -> fully qualified name.
+    function_names: list[str] = []
     if binary:
+        strings = _string_table(binary.strings)
         for func in binary.functions:
-            fqdn, name = _get_fqdn(func, binary.strings)
+            fqdn, name = _get_fqdn(func, strings)
             fqdn = (fqdn + '.' + name) if fqdn else name
-            functions[func.address] = fqdn, f"{name}: {_get_signature(func, binary.strings, binary.types)}"
+            function_names.append(fqdn)
+            functions[func.address] = fqdn, f"{name}: {_get_signature(func, strings, binary.types)}"
     with BytesIO(bytecode) as stream:
         pos = stream.tell()
         opcode: OpcodeEnum | None = OpcodeEnum.RET
@@ -55,53 +83,33 @@ def decompile(bytecode: bytes, binary: BytecodeBinary | None = None, single_func
                 break
             if binary is not None:
                 args = tuple(
-                    _get_function_id(a, binary) if p == ParamType.FunctionId else a
+                    function_names[a] if p == ParamType.FunctionId else a
                     for p, a in zip(opcode.params, args))
             if last_opcode == OpcodeEnum.RET and pos in functions:
                 if single_function:
                     return
                 fqdn, sig = functions[pos]
-                yield f"       {FAINT}│                               │ {RESET + FUNC_NAME}{fqdn + ':':<17}   {COMMENT}; {sig} = {{ /* ... */ }}{RESET}"
+                yield _FUNCTION_ROW % (fqdn + ':', sig)
 
             asm, explain = opcode.as_asm(*args)
             padding = ''
             if len(asm) < 17:
                 padding = ' ' * (17 - len(asm))
-            op = asm
-            params = ''
-            if ' ' in asm:
-                op, params = asm.split(' ', maxsplit=1)
+            op, _, params = asm.partition(' ')
             # input(f"{asm!r} -> {op!r} - {params!r}")
-
-            param_count = 0
-            if '.' in op:
-                first, *rest = op.split('.')
-                param_count = len(rest)
-                op = f"{KEYWORD}{first}{RESET}.{PARAM}" + f'{RESET}.{PARAM}'.join(rest) + RESET
-            else:
-                op = KEYWORD + op + RESET
-
-            asm = op
+            asm, param_count = _color_op(op)
+            operand_color = FUNC_NAME if opcode == OpcodeEnum.CALL_EXPORT else CONSTANT
             if params:
-                color = FUNC_NAME if opcode == OpcodeEnum.CALL_EXPORT else CONSTANT
-                asm += ' ' + color + params + RESET
+                asm += ' ' + operand_color + params + RESET
             asm += padding
 
-            hex_bytes = ' '.join(f'{x:02x}' for x in raw)
-            padding = ''
-            if len(hex_bytes) < 29:
-                padding = ' ' * (29 - len(hex_bytes))
-            hb = hex_bytes.split(' ')
-            hex_bytes = KEYWORD + hb[0] + RESET
-            for i, b in enumerate(hb[1:]):
-                if i < param_count:
-                    hex_bytes += ' ' + PARAM + b
-                elif opcode == OpcodeEnum.CALL_EXPORT:
-                    hex_bytes += ' ' + FUNC_NAME + b
-                else:
-                    hex_bytes += ' ' + CONSTANT + b
+            # Pad to 29 columns: two hex digits per byte, separated by spaces.
+            padding = ' ' * (29 - (len(raw) * 3 - 1))
+            hex_bytes = KEYWORD + raw[:1].hex() + RESET
+            # Type parameter bytes, then the rest of the operands.
+            hex_bytes += _color_hex(raw[1:param_count + 1], PARAM)
+            hex_bytes += _color_hex(raw[param_count + 1:], operand_color)
             hex_bytes += RESET
 
-            yield (f"{FAINT}{pos:#06x} │ {RESET + NUM}{hex_bytes + padding} "
-                   f"{RESET + FAINT}│{RESET}   {asm} {COMMENT}; {explain}{RESET}")
+            yield _INSTRUCTION_ROW % (pos, hex_bytes, padding, asm, explain)
             pos = stream.tell()
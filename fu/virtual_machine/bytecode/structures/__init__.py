@@ -1,22 +1,26 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum
+from functools import cache, partial
 from io import BytesIO, IOBase
-from typing import Generic, Iterator, NewType, Self, Sequence, TypeVar, Union
+from logging import getLogger
+from typing import Any, Callable, Generic, Iterator, NewType, Self, Sequence, TypeVar, Union
 
 from .. import BytecodeTypes, _encode_f32, _encode_u8, int_u8, _encode_numeric, int_u32, float_f32
 
+_LOG = getLogger(__package__)
+
 
 class BytecodeBase(ABC):  # type: ignore[misc]
     """Base class for all bytecode structures."""
+    __slots__ = ()
 
     @classmethod
     def decode(cls, stream: IOBase) -> Self:
         raise NotImplementedError()
 
     def encode(self, stream: IOBase) -> None:
-        for x in _to_bytes(self._encode()):
-            stream.write(x)
+        _write_bytes(self._encode(), stream.write)
 
     @abstractmethod
     def _encode(self) -> Iterator[Union[BytecodeTypes, 'BytecodeBase']]:
@@ -31,7 +35,7 @@ class BytecodeContainer(Generic[T], BytecodeBase, ABC):  # type: ignore[misc]
     content: Sequence[T] = field(default_factory=list)
 
     def _encode(self) -> Iterator[T | BytecodeTypes]:
-        print(f"encoding {type(self).__name__}: {len(self.content)}")
+        _LOG.debug("Encoding %s: %d", type(self).__name__, len(self.content))
         yield _encode_numeric(len(self.content), int_u32)
         yield from self.content
 
@@ -41,26 +45,62 @@ from .code import *
 from .types import *
 
 
-def _to_bytes(in_: Iterator[BytecodeTypes | BytecodeBase], silent=False) -> Iterator[bytes]:
-    for x in in_:
-        # if not silent:
-        #     print(f"Bytecode Structure to-bytes: {x}")
-        match x:
-            case BytecodeBase():
-                yield from _to_bytes(x._encode())
-            case tuple():
-                yield from _to_bytes((y for y in x), silent=True)
-            case Enum():
-                val = x.value
-                assert isinstance(val, int) and \
-                    max(type(x)._value2member_map_.keys()) < 255 and \
-                    min(type(x)._value2member_map_.keys()) >= 0  # noqa
-                yield _encode_numeric(val, int_u8)
-            case int():
-                yield _encode_numeric(x, int_u8)
-            case float():
-                yield _encode_numeric(x, float_f32)
-            case bool():
-                yield b'\x01' if x else b'\x00'
-            case _:
-                yield x
+@cache
+def _fits_u8(enum: type[Enum]) -> bool:
+    values = enum._value2member_map_.keys()
+    return all(isinstance(v, int) for v in values) and max(values) < 255 and min(values) >= 0
+
+
+def _encode_enum(x: Enum) -> bytes:
+    assert _fits_u8(type(x))
+    return _encode_numeric(x.value, int_u8)
+
+
+def _encode_other(x: BytecodeTypes) -> bytes:
+    if isinstance(x, Enum):
+        return _encode_enum(x)
+    return x  # type: ignore
+
+
+# Encoders for values `_write_bytes` writes directly, by exact type. Anything else falls back to `_encode_other`.
+_ENCODERS: dict[type, Callable[[Any], bytes]] = {
+    bytes: bytes,
+    int: partial(_encode_numeric, to=int_u8),
+    bool: partial(_encode_numeric, to=int_u8),
+    float: _encode_f32,
+}
+
+
+# How much `_write_bytes` buffers before handing it to the stream. Blobs at least this large skip the buffer.
+_WRITE_CHUNK = 64 * 1024
+
+
+def _write_bytes(in_: Iterator[BytecodeTypes | BytecodeBase], write: Callable[[bytes | bytearray], Any]) -> None:
+    """Flatten `in_`, encoding nested structures and tuples in place, and `write` it out in chunks."""
+    out = bytearray()
+    # Iterators being flattened, innermost last. Nested structures and tuples push a new iterator; the one below it
+    # resumes where it left off once it's exhausted.
+    stack: list[Iterator[Any]] = [iter(in_)]
+    while stack:
+        for x in stack[-1]:
+            if isinstance(x, BytecodeBase):
+                stack.append(x._encode())
+                break
+            if isinstance(x, tuple):
+                stack.append(iter(x))
+                break
+            encoded = _ENCODERS.get(type(x), _encode_other)(x)
+            if len(encoded) >= _WRITE_CHUNK:
+                if out:
+                    write(out)
+                    out = bytearray()
+                write(encoded)
+                continue
+            out += encoded
+            if len(out) >= _WRITE_CHUNK:
+                write(out)
+                out = bytearray()
+        else:
+            stack.pop()
+    if out:
+        write(out)
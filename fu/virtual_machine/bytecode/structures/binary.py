@@ -1,6 +1,7 @@
+import struct
 from enum import IntFlag
-from io import BytesIO, IOBase, SEEK_CUR
-from logging import getLogger
+from io import IOBase
+from logging import DEBUG, getLogger
 from typing import TYPE_CHECKING, ClassVar, Iterator, Self, TypeAlias
 from humanize.filesize import naturalsize
 
@@ -11,15 +12,25 @@ if TYPE_CHECKING:
     from .code import BytecodeFunction
     from .types import BytecodeType
 
-from .. import _encode_numeric, _encode_u32, int_u16, int_u32, int_u8, _decode_u8, _decode_u32, _decode_u16
+from .. import _encode_numeric, _encode_u16, _encode_u32, int_u16, int_u32, int_u8, _decode_u8, _decode_u32, _decode_u16
 
 _LOG = getLogger(__package__)
 
 SourceMap: TypeAlias = dict[SourceLocation, tuple[int_u32, int_u32]]
 
+# A source map entry, following its file name: seek range (u32s), line range, column range (u16s), and the bytecode
+# range it maps to (u32s).
+_SOURCE_MAP_ENTRY = struct.Struct('>IIHHHHII')
+
+
+def _bytecode_start(entry: tuple[SourceLocation, tuple[int_u32, int_u32]]) -> int_u32:
+    return entry[1][0]
+
 
 class BytecodeBinary(BytecodeBase):
     """A complete binary."""
+    __slots__ = ('flags', 'entrypoint', 'bytecode', 'strings', 'types', 'functions', 'source_map', '_strings_count')
+
     MAGIC: ClassVar[bytes] = b'foo-binary-v0.0.1'
 
     class Flags(IntFlag):
@@ -33,22 +44,21 @@ class BytecodeBinary(BytecodeBase):
     strings: bytes
     types: list['BytecodeType']
     functions: list['BytecodeFunction']
-    source_map: SourceMap | None = None
+    source_map: SourceMap | None
 
-    _strings_count: int | None = None
+    _strings_count: int | None
 
     @property
     def strings_count(self) -> int:
         if self._strings_count is not None:
             return self._strings_count
         i = 0
-        with BytesIO(self.strings) as stream:
-            val = stream.read(4)
-            while val != b'':
-                string_len = _decode_u32(val)
-                stream.seek(string_len, SEEK_CUR)
-                i += 1
-                val = stream.read(4)
+        offset = 0
+        strings = self.strings
+        # Each string is its u32 length, followed by that many bytes.
+        while offset < len(strings):
+            offset += 4 + _decode_u32(strings, offset)
+            i += 1
         self._strings_count = i
         return i
 
@@ -68,7 +78,9 @@ class BytecodeBinary(BytecodeBase):
         self.types = types
         self.functions = functions
         self.entrypoint = entrypoint
-        self.source_map = source_map
+        # Kept in bytecode order, so encoding can walk it as-is. Decoded maps are already in this order.
+        self.source_map = dict(sorted(source_map.items(), key=_bytecode_start)) if source_map is not None else None
+        self._strings_count = None
 
     @classmethod
     def decode(cls, stream: IOBase, load_source_map=True) -> Self:
@@ -88,10 +100,8 @@ class BytecodeBinary(BytecodeBase):
         for _ in range(_decode_u16(stream.read(2))):
             types.append(BytecodeType.decode(stream))
 
-        funcs: list['BytecodeFunction'] = []
         from .code import BytecodeFunction
-        for _ in range(_decode_u16(stream.read(2))):
-            funcs.append(BytecodeFunction.decode(stream))
+        funcs = BytecodeFunction.decode_many(stream, _decode_u16(stream.read(2)))
 
         bytecode = stream.read(_decode_u32(stream.read(4)))
 
@@ -100,69 +110,54 @@ class BytecodeBinary(BytecodeBase):
             source_map = {}
             for _ in range(_decode_u16(stream.read(2))):
                 file_name = stream.read(_decode_u16(stream.read(2))).decode('utf-8')
-                seek = (_decode_u32(stream.read(4)), _decode_u32(stream.read(4)))
-                lines = (_decode_u16(stream.read(2)), _decode_u16(stream.read(2)))
-                columns = (_decode_u16(stream.read(2)), _decode_u16(stream.read(2)))
-                op_range = (_decode_u32(stream.read(4)), _decode_u32(stream.read(4)))
-                source_map[SourceLocation(seek, lines, columns, file_name)] = op_range
+                seek0, seek1, line0, line1, column0, column1, op0, op1 = _SOURCE_MAP_ENTRY.unpack(
+                    stream.read(_SOURCE_MAP_ENTRY.size))
+                source_map[SourceLocation((seek0, seek1), (line0, line1), (column0, column1), file_name)] = op0, op1
 
         return cls(bytecode, strings, types, funcs, entrypoint, source_map)
 
     def _encode(self) -> Iterator[BytecodeTypes | BytecodeBase]:
-        _LOG.debug(f"Magic ({BytecodeBinary.MAGIC!r})")
+        debug = _LOG.isEnabledFor(DEBUG)
+        _LOG.debug("Magic (%r)", BytecodeBinary.MAGIC)
         yield BytecodeBinary.MAGIC
 
-        _LOG.debug(f'Flags ({_encode_numeric(self.flags.value, int_u8)!r})')
+        _LOG.debug('Flags (%r)', _encode_numeric(self.flags.value, int_u8))
         yield self.flags
 
         if self.entrypoint is not None:
-            _LOG.debug(f'Entrypoint ({self.entrypoint:#06x})')
+            _LOG.debug('Entrypoint (%#06x)', self.entrypoint)
             yield _encode_u32(self.entrypoint)
 
         # yield self.strings
-        _LOG.debug(f"Strings length ({naturalsize(len(self.strings), True, format='%.02f')}), strings blob")
-        yield _encode_numeric(len(self.strings), int_u32), self.strings
+        if debug:
+            _LOG.debug("Strings length (%s), strings blob", naturalsize(len(self.strings), True, format='%.02f'))
+        yield _encode_u32(int_u32(len(self.strings))), self.strings
 
-        # with BytesIO() as buffer:
-        _LOG.debug(f"Types count ({len(self.types):,})")
-        yield _encode_numeric(len(self.types), int_u16)
+        _LOG.debug("Types count (%d)", len(self.types))
+        yield _encode_u16(int_u16(len(self.types)))
         for i, t in enumerate(self.types):
-            _LOG.debug(f"\tType #{i}")
-            with BytesIO() as buffer:
-                t.encode(buffer)
-                yield buffer.getvalue()
+            _LOG.debug("\tType #%d", i)
+            yield t
 
         # yield self.functions
-        _LOG.debug(f"Functions count ({len(self.functions):,})")
-        yield _encode_numeric(len(self.functions), int_u16)
+        _LOG.debug("Functions count (%d)", len(self.functions))
+        yield _encode_u16(int_u16(len(self.functions)))
         for i, f in enumerate(self.functions):
-            with BytesIO() as buffer:
-                f.encode(buffer)
-                _LOG.debug(f"\tFunction #{i}")
-                yield buffer.getvalue()
+            _LOG.debug("\tFunction #%d", i)
+            yield f
 
         # yield self.bytecode
-        _LOG.debug(f"Bytecode length ({naturalsize(len(self.bytecode), True, format='%.02f')}), bytecode blob")
-        yield _encode_numeric(len(self.bytecode), int_u32), self.bytecode
+        if debug:
+            _LOG.debug("Bytecode length (%s), bytecode blob", naturalsize(len(self.bytecode), True, format='%.02f'))
+        yield _encode_u32(int_u32(len(self.bytecode))), self.bytecode
 
-        yield _encode_numeric(len(self.source_map) if self.source_map is not None else 0, int_u16)
+        yield _encode_u16(int_u16(len(self.source_map) if self.source_map is not None else 0))
 
         if self.source_map is None:
             return
 
-        _LOG.debug(f"Sourcemap count ({len(self.source_map):,})")
-        for i, (k, v) in enumerate(sorted(self.source_map.items(), key=lambda e: e[1][0])):
-            with BytesIO() as buffer:
-                _LOG.debug(f"\tSource Map #{i}: {k}: {v}")
-                fname = k.file.encode('utf-8')
-                buffer.write(_encode_numeric(len(fname), int_u16))
-                buffer.write(fname)
-                buffer.write(_encode_numeric(k.seek[0], int_u32))
-                buffer.write(_encode_numeric(k.seek[1], int_u32))
-                buffer.write(_encode_numeric(k.lines[0], int_u16))
-                buffer.write(_encode_numeric(k.lines[1], int_u16))
-                buffer.write(_encode_numeric(k.columns[0], int_u16))
-                buffer.write(_encode_numeric(k.columns[1], int_u16))
-                buffer.write(_encode_u32(v[0]))
-                buffer.write(_encode_u32(v[1]))
-                yield buffer.getvalue()
+        _LOG.debug("Sourcemap count (%d)", len(self.source_map))
+        for i, (k, v) in enumerate(self.source_map.items()):
+            _LOG.debug("\tSource Map #%d: %s: %s", i, k, v)
+            fname = k.file.encode('utf-8')
+            yield _encode_u16(int_u16(len(fname))), fname, _SOURCE_MAP_ENTRY.pack(*k.seek, *k.lines, *k.columns, *v)
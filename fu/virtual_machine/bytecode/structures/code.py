@@ -1,15 +1,20 @@
+import struct
 from io import IOBase
 from logging import getLogger
 from typing import Iterator, Self
 
-from .. import _encode_u16, _encode_u32, int_u16, int_u32, _decode_u16, _decode_u32
+from .. import int_u16, int_u32
 from . import BytecodeBase, BytecodeTypes
 
 _LOG = getLogger(__package__)
 
+# A function record: name and scope (u32 string ids), signature (u16 type id), and address (u32).
+_FUNCTION_RECORD = struct.Struct('>IIHI')
+
 
 class BytecodeFunction(BytecodeBase):
     """An exported function."""
+    __slots__ = ('name', 'scope', 'signature', 'address')
 
     name: int_u32
     """Function name, as an index into the Strings table."""
@@ -28,22 +33,23 @@ class BytecodeFunction(BytecodeBase):
         self.address = address
 
     def _encode(self) -> Iterator[BytecodeTypes | BytecodeBase]:
-        _LOG.debug(f"\t\tName: string #{self.name}")
-        yield _encode_u32(self.name)
-        _LOG.debug(f"\t\tScope: string #{self.scope}" if self.scope else "\t\tScope: <global>")
-        yield _encode_u32(self.scope)
-        _LOG.debug(f"\t\tType: type #{self.signature}")
-        yield _encode_u16(self.signature)
-        _LOG.debug(f"\t\tCode: {self.name:#06x}")
-        yield _encode_u32(self.address)
+        _LOG.debug("\t\tName: string #%d", self.name)
+        if self.scope:
+            _LOG.debug("\t\tScope: string #%d", self.scope)
+        else:
+            _LOG.debug("\t\tScope: <global>")
+        _LOG.debug("\t\tType: type #%d", self.signature)
+        _LOG.debug("\t\tCode: %#06x", self.name)
+        yield _FUNCTION_RECORD.pack(self.name, self.scope, self.signature, self.address)
 
     @classmethod
     def decode(cls, stream: IOBase) -> Self:
-        name = _decode_u32(stream.read(4))
-        scope = _decode_u32(stream.read(4))
-        signature = _decode_u16(stream.read(2))
-        address = _decode_u32(stream.read(4))
-        return cls(name, scope, signature, address)
+        return cls(*_FUNCTION_RECORD.unpack(stream.read(_FUNCTION_RECORD.size)))
+
+    @classmethod
+    def decode_many(cls, stream: IOBase, count: int) -> list[Self]:
+        """Decode `count` consecutive functions."""
+        return [cls(*record) for record in _FUNCTION_RECORD.iter_unpack(stream.read(_FUNCTION_RECORD.size * count))]
 
 
 __all__ = ('BytecodeFunction', )
@@ -1,10 +1,11 @@
+import struct
 from enum import Enum
 from io import IOBase
-from logging import getLogger
+from logging import DEBUG, getLogger
 from typing import TYPE_CHECKING, Iterator, Self
 
 from ....types import TypeBase
-from .. import _encode_numeric, _encode_u16, _encode_u32, int_u16, int_u32, _decode_u8, _decode_u32, _decode_u16, _decode_bool, _encode_bool
+from .. import int_u16, int_u32, _decode_u8, _decode_u32, _decode_u16, _decode_bool
 from . import BytecodeBase, BytecodeTypes
 
 if TYPE_CHECKING:
@@ -13,6 +14,10 @@ if TYPE_CHECKING:
 
 _LOG = getLogger(__package__)
 
+# A named type's record: kind (u8), name (string id, u32), and whether it's callable. Callable types follow it with
+# their return type, parameter count and parameter types (u16s).
+_NAMED_TYPE = struct.Struct('>BI?')
+
 
 class BytecodeType(BytecodeBase):
     """A usertype definition."""
@@ -22,7 +27,9 @@ class BytecodeType(BytecodeBase):
         IMPORTED_TYPE = 1
         VOID = 1
 
-    type_: Type = Type.TYPE_DEFINITION
+    __slots__ = ('type_', '_underlying', 'name', 'callable')
+
+    type_: Type
     _underlying: TypeBase | None
 
     name: int_u32 | None
@@ -54,23 +61,22 @@ class BytecodeType(BytecodeBase):
             assert name is not None
 
     def _encode(self) -> Iterator[BytecodeTypes | BytecodeBase]:
-        _LOG.debug(f"\t\tBuiltin: {self.type_}")
-        yield self.type_
+        _LOG.debug("\t\tBuiltin: %s", self.type_)
         if self.type_ not in (BytecodeType.Type.TYPE_DEFINITION, BytecodeType.Type.IMPORTED_TYPE):
+            yield self.type_
             return
         assert self._underlying is not None
         assert self.name is not None
-        _LOG.debug(f"\t\tName: {self._underlying.name} (string #{self.name})")
-        yield _encode_u32(self.name)
-
-        _LOG.debug(f"\t\tCallable: {self.callable is not None}")
-        yield _encode_bool(self.callable is not None)
-        if self.callable is not None:
-            params = ', '.join(f"type #{x}" for x in self.callable[0])
-            _LOG.debug(f"\t\t\tReturn: type #{self.callable[1]}; Params: ({params})")
-            yield _encode_u16(self.callable[1])
-            yield _encode_numeric(len(self.callable[0]), int_u16)
-            yield from (_encode_u16(y) for y in self.callable[0])
+        _LOG.debug("\t\tName: %s (string #%d)", self._underlying.name, self.name)
+        _LOG.debug("\t\tCallable: %s", self.callable is not None)
+        if self.callable is None:
+            yield _NAMED_TYPE.pack(self.type_.value, self.name, False)
+            return
+        params, ret = self.callable
+        if _LOG.isEnabledFor(DEBUG):
+            _LOG.debug("\t\t\tReturn: type #%d; Params: (%s)", ret, ', '.join(f"type #{x}" for x in params))
+        yield _NAMED_TYPE.pack(self.type_.value, self.name, True)
+        yield struct.pack(f'>HH{len(params)}H', ret, len(params), *params)
 
     @classmethod
     def decode(cls, stream: IOBase) -> Self:
@@ -86,7 +92,8 @@ class BytecodeType(BytecodeBase):
         if is_callable:
             return_type = _decode_u16(stream.read(2))
             param_count = _decode_u16(stream.read(2))
-            callable_ = tuple(_decode_u16(stream.read(2)) for _ in range(param_count)), return_type
+            # Parameter type ids are a run of u16s; read and unpack them in one go.
+            callable_ = struct.unpack(f'>{param_count}H', stream.read(2 * param_count)), return_type
         return cls(name=name, callable_=callable_)
 
 
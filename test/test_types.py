@@ -0,0 +1,62 @@
+from pytest import mark, raises
+
+INT_VALUES = (
+    (0, False, 'u8'),
+    (255, False, 'u8'),
+    (256, False, 'u16'),
+    (65536, False, 'u32'),
+    (2**64 - 1, False, 'u64'),
+    (127, True, 'i8'),
+    (128, True, 'i16'),
+    (-1, False, 'i8'),
+    (-129, False, 'i16'),
+    (-2**63, False, 'i64'),
+)
+
+
+@mark.parametrize('value,want_signed,expect', INT_VALUES)
+def test_int_best_for_value(value, want_signed, expect):
+    from fu.types import IntType
+    assert IntType.best_for_value(value, want_signed=want_signed).name == expect
+
+
+@mark.parametrize('value', (2**64, -2**63 - 1))
+def test_int_best_for_value_too_wide(value):
+    from fu.types import IntType
+    with raises(ValueError):
+        IntType.best_for_value(value)
+
+
+@mark.parametrize('value,expect', ((0.5, 'f16'), (65504.0, 'f16'), (1e5, 'f32'), (1e39, 'f64')))
+def test_float_best_for_value(value, expect):
+    from fu.types import FloatType
+    assert FloatType.best_for_value(value).name == expect
+
+
+@mark.parametrize('values,expect', (({'a': 0, 'b': 255}, 'u8'), ({'a': 0, 'b': 256}, 'u16'), ({'a': -1, 'b': 127}, 'i8'),
+                                    ({'a': -129, 'b': 0}, 'i16'), ({'a': -1, 'b': 128}, 'i16')))
+def test_enum_underlying_type(values, expect):
+    from fu.types import EnumType
+    assert EnumType('e', values, signed=False).inherits[0].name == expect
+
+
+@mark.parametrize('name,expect', (('u8', (0, 255)), ('i8', (-128, 127)), ('u64', (0, 2**64 - 1)), ('bool', (0, 255))))
+def test_int_range(name, expect):
+    from fu import types
+    type_ = getattr(types, name.upper() + '_TYPE')
+    assert type_.range() == expect
+    assert type_.could_hold_int(expect[0]) and type_.could_hold_int(expect[1])
+    assert not type_.could_hold_int(expect[0] - 1) and not type_.could_hold_int(expect[1] + 1)
+
+
+@mark.parametrize('value,expect', ((255.0, True), (255.5, False), (-0.5, False), (0.5, True)))
+def test_int_could_hold_float(value, expect):
+    from fu.types import U8_TYPE
+    assert U8_TYPE.could_hold_int(value) == expect
+
+
+def test_numeric_types_to_type():
+    from fu.virtual_machine.bytecode import NumericTypes
+    for numeric_type in NumericTypes:
+        type_ = numeric_type.to_type()
+        assert type_.name == numeric_type.name and type_.size == len(numeric_type)
@@ -0,0 +1,183 @@
+from functools import partial
+
+from pytest import raises
+
+
+def _assemble(*ops) -> bytes:
+    from fu.virtual_machine.bytecode import to_bytes
+    return bytes(to_bytes(iter(ops)))
+
+
+def _vm(*ops, functions=(), args=()):
+    from fu.virtual_machine import VM
+    from fu.virtual_machine.bytecode.structures import BytecodeBinary
+    return VM(BytecodeBinary(_assemble(*ops), b'', [], list(functions), 0), list(args))
+
+
+def _run(*ops, functions=(), args=()) -> int:
+    return _vm(*ops, functions=functions, args=args).run()
+
+
+def _run_unfused(monkeypatch, *ops, functions=()) -> int:
+    """Run with every instruction decoded on its own, without superinstructions."""
+    from fu.virtual_machine import VM
+    with monkeypatch.context() as m:
+        m.setattr(VM, '_decode_instruction', lambda self, ip: self._decode_at(ip)[0])
+        return _run(*ops, functions=functions)
+
+
+def _handler(vm, ip: int):
+    """The handler decoded at `ip`, without the tracing wrapper it gets when debug logging is on."""
+    handler = vm._instructions[ip][0]
+    if isinstance(handler, partial) and handler.func == vm._trace:
+        return handler.args[0]
+    return handler
+
+
+def _push(value: int, type_=None):
+    from fu.virtual_machine.bytecode import NumericTypes, OpcodeEnum, _encode_u8
+    return OpcodeEnum.PUSH_LITERAL, type_ or NumericTypes.u8, _encode_u8(value)
+
+
+def _jump(op, offset: int):
+    from fu.virtual_machine.bytecode import OpcodeEnum, _encode_i16
+    return OpcodeEnum[op], _encode_i16(offset)
+
+
+def _op(name: str, param=None):
+    from fu.virtual_machine.bytecode import NumericTypes, OpcodeEnum, _encode_u8
+    op = OpcodeEnum[name]
+    if param is None:
+        return op
+    if isinstance(param, NumericTypes):
+        return op, param
+    return op, _encode_u8(param)
+
+
+def _ret():
+    return _op('RET')
+
+
+def _add():
+    from fu.virtual_machine.bytecode import NumericTypes
+    return _op('CHECKED_ADD', NumericTypes.u8)
+
+
+def _sub():
+    from fu.virtual_machine.bytecode import NumericTypes
+    return _op('CHECKED_SUB', NumericTypes.u8)
+
+
+# local #0 = 200; return local #0 + 5
+ADD_LOCAL = (_push(200), _op('INIT_LOCAL'), _op('PUSH_LOCAL', 0), _push(5), _add(), _ret())
+# push 7, then jump past PUSH_LOCAL into the middle of `push local #0, push 5, add`; returns 7 + 5.
+ADD_MIDDLE = (_push(0), _op('INIT_LOCAL'), _push(7), _jump('JMP', 2), _op('PUSH_LOCAL', 0), _push(5), _add(), _ret())
+
+
+def test_fused_arithmetic(monkeypatch):
+    vm = _vm(*ADD_LOCAL)
+    assert vm.run() == 205 == _run_unfused(monkeypatch, *ADD_LOCAL)
+    # PUSH_LOCAL at 0x04 starts the fused sequence.
+    handler = _handler(vm, 4)
+    assert isinstance(handler, partial) and handler.func == vm._op_push_literal_arithmetic
+
+
+def test_fused_arithmetic_overflow(monkeypatch):
+    ops = (_push(251), *ADD_LOCAL[1:])
+    with raises(RuntimeError, match='over/underflow'):
+        _run(*ops)
+    with raises(RuntimeError, match='over/underflow'):
+        _run_unfused(monkeypatch, *ops)
+
+
+def test_jump_into_fused_sequence(monkeypatch):
+    vm = _vm(*ADD_MIDDLE)
+    assert vm.run() == 12 == _run_unfused(monkeypatch, *ADD_MIDDLE)
+    # The jump lands on PUSH_LITERAL at 0x0c, which runs on its own.
+    assert _handler(vm, 12) == vm._op_push_literal
+
+
+def test_fused_less_jz(monkeypatch):
+    # local #0 = 3; return 1 if local #0 < 5 else 2
+    ops = (_push(3), _op('INIT_LOCAL'), _op('PUSH_LOCAL', 0), _push(5), _op('LESS'), _jump('JZ', 4), _push(1), _ret(),
+           _push(2), _ret())
+    vm = _vm(*ops)
+    assert vm.run() == 1 == _run_unfused(monkeypatch, *ops)
+    assert _handler(vm, 4) == vm._op_push_literal_less_jz
+    ops = (_push(8), *ops[1:])
+    assert _run(*ops) == 2 == _run_unfused(monkeypatch, *ops)
+
+
+def _function(address: int):
+    from fu.virtual_machine.bytecode import int_u16, int_u32
+    from fu.virtual_machine.bytecode.structures import BytecodeFunction
+    return BytecodeFunction(int_u32(0), int_u32(0), int_u16(0), int_u32(address))
+
+
+def _call(op: str, function: int):
+    from fu.virtual_machine.bytecode import OpcodeEnum, _encode_u16
+    return (_op('INIT_ARGS', 1), (OpcodeEnum[op], _encode_u16(function)))
+
+
+# return f(50) + f(50), where f(n) = 0 if n == 0 else f(n - 1) + 1
+RECURSE = (
+    _push(50), _call('CALL_EXPORT', 0), _push(50), _call('CALL_EXPORT', 0), _add(), _ret(),
+    # f, at 0x13
+    _op('PUSH_ARG', 0), _push(0), _op('CMP'), _jump('JZ', 4), _push(0), _ret(),
+    _op('PUSH_ARG', 0), _push(1), _sub(), _call('CALL_EXPORT', 0), _push(1), _add(), _ret())
+# return g(0), where g(n) = g(n + 1) if n < 200 else n, as a tail call
+TAIL_RECURSE = (
+    _push(0), _call('CALL_EXPORT', 0), _ret(),
+    # g, at 0x09
+    _op('PUSH_ARG', 0), _push(200), _op('LESS'), _jump('JZ', 12),
+    _op('PUSH_ARG', 0), _push(1), _add(), _call('TAIL_EXPORT', 0),
+    _op('PUSH_ARG', 0), _ret())
+
+
+def test_fused_call(monkeypatch):
+    vm = _vm(*RECURSE, functions=[_function(0x13)])
+    assert vm.run() == 100 == _run_unfused(monkeypatch, *RECURSE, functions=[_function(0x13)])
+    # INIT_ARGS at 0x27 is fused with the recursive CALL_EXPORT.
+    assert _handler(vm, 0x27) == vm._op_init_args_call_export
+    # The second call to f reuses the frames returned by the first: f(50) down to f(0), and main's.
+    assert len(vm._frame_pool) == 52
+
+
+def test_fused_tail_call(monkeypatch):
+    # More tail calls than MAX_RECURSION: each reuses its caller's frame.
+    vm = _vm(*TAIL_RECURSE, functions=[_function(0x09)])
+    assert vm.run() == 200 == _run_unfused(monkeypatch, *TAIL_RECURSE, functions=[_function(0x09)])
+    assert _handler(vm, 0x19) == vm._op_init_args_tail_export
+
+
+def test_jump_relative_to_next_instruction():
+    # The offset is from the end of the JMP, so this skips `push 2`.
+    assert _run(_push(1), _jump('JMP', 3), _push(2), _ret()) == 1
+
+
+def test_jump_out_of_code_not_taken():
+    # The JZ's target is just past the end of the code, but it isn't taken.
+    assert _run(_push(1), _jump('JZ', 1), _ret()) == 1
+
+
+def test_jump_out_of_code_taken():
+    with raises(RuntimeError, match='out of bounds'):
+        _run(_push(0), _jump('JZ', 1), _ret())
+    with raises(RuntimeError, match='out of bounds'):
+        _run(_push(1), _jump('JMP', -10), _ret())
+
+
+def test_string_length_slot():
+    # return args[0].length
+    assert _run(_op('PUSH_ARG', 0), _push(0), _op('PUSH_ARRAY'), _op('PUSH_REF', 0), _ret(), args=['hello']) == 5
+
+
+def test_string_slots():
+    from fu.virtual_machine import _get_slot_of
+    assert _get_slot_of('hello', 0) == 5
+    assert _get_slot_of('hello', 1) == 'h'
+
+
+def test_undefined_opcode():
+    with raises(NotImplementedError, match='0xee'):
+        _run(bytes([0xEE]))